@@ -4,15 +4,20 @@ import argparse
 import re
 import subprocess
 import logging
-from pathlib import Path
-from typing import List, Dict, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Set, Tuple
 
-def setup_logging(log_file: str):
+def setup_logging(log_file: str, log_level: str = "DEBUG"):
+    file_handler = logging.FileHandler(log_file, mode="w")
+    file_handler.setLevel(log_level)
+    # The root level only drops below INFO when the file wants debug records,
+    # so per-file debug calls stay a cheap level check otherwise and the
+    # console keeps its INFO progress lines whatever the file level is.
     logging.basicConfig(
-        filename=log_file,
-        level=logging.DEBUG,
+        level=min(file_handler.level, logging.INFO),
         format="%(asctime)s - %(levelname)s - %(message)s",
-        filemode="w",
+        handlers=[file_handler],
     )
     console = logging.StreamHandler()
     console.setLevel(logging.INFO)
@@ -23,72 +28,230 @@ default_excluded_folders = [".git", "node_modules", "__pycache__", "theme", "CLA
 default_excluded_extensions = [".csv", ".pt", ".pkl", ".bin", ".h5", ".parquet", ".png", ".ico", ".jpg", ".svg", ".sqlite3", ".code-profile", ".ipynb", ".mermaid", ".xlsx", ".docx"]
 def clone_repository(repo_url: str, target_dir: str) -> None:
     logging.info(f"Cloning repository: {repo_url} to {target_dir}")
-    subprocess.run(["git", "clone", repo_url, target_dir], check=True)
+    subprocess.run(
+        ["git", "clone", "--depth", "1", "--single-branch", "--filter=blob:none", repo_url, target_dir],
+        check=True,
+    )
     logging.info("Repository cloned successfully")
 
-def clear_directory_cache(path: str):
+def list_gitignored_paths(repo_path: str):
     try:
-        os.scandir(path).close()
-    except:
-        pass
+        result = subprocess.run(
+            ["git", "-C", repo_path, "ls-files", "-z", "--others", "--ignored", "--exclude-standard", "--directory"],
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        logging.warning(f"Could not list gitignored files, walking the whole directory: {str(e)}")
+        return None
+
+    # Join paths the same way os.scandir builds entry paths so
+    # process_directory can test membership directly. Ignored directories
+    # are listed once, with a trailing slash, instead of file by file.
+    paths = set()
+    for raw_path in result.stdout.split(b"\0"):
+        if raw_path:
+            paths.add(os.path.join(repo_path, *os.fsdecode(raw_path).rstrip("/").split("/")))
+    return paths
 
 def should_include_file(file_path: str, file_size: int, params: Dict) -> bool:
-    ext = Path(file_path).suffix.lower()
+    ext = os.path.splitext(file_path)[1].lower()
     
     if ext in params["exclude_extensions"]:
-        logging.debug(f"Excluded file due to extension: {file_path}")
+        logging.debug("Excluded file due to extension: %s", file_path)
         return False
     
     if file_size > params["max_file_size"]:
-        logging.debug(f"Excluded file due to size: {file_path}")
+        logging.debug("Excluded file due to size: %s", file_path)
         return False
     
     return True
 
+# Reads go through a per-thread buffer instead of a fresh TextIOWrapper per
+# file. Files bigger than the buffer get a one-off allocation so a single
+# large file does not pin memory in every worker thread.
+read_buffer_size = 1024*1024
+read_buffers = threading.local()
+
+def read_into(fd: int, view: memoryview) -> int:
+    if hasattr(os, "readv"):
+        return os.readv(fd, [view])
+    data = os.read(fd, len(view))
+    view[:len(data)] = data
+    return len(data)
+
+def read_text(file_path: str, file_size: int) -> str:
+    buffer = getattr(read_buffers, "buffer", None)
+    if buffer is None:
+        buffer = read_buffers.buffer = bytearray(read_buffer_size)
+    if file_size >= len(buffer):
+        buffer = bytearray(file_size + 1)
+    view = memoryview(buffer)
+
+    fd = os.open(file_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        if file_size > 128*1024 and hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        length = 0
+        while length < len(view):
+            count = read_into(fd, view[length:])
+            if not count:
+                break
+            length += count
+        data = view[:length]
+        if length == len(view):
+            # The file grew since it was stat'ed; pick up the remainder.
+            data = bytes(data) + b"".join(iter(lambda: os.read(fd, 64*1024), b""))
+    finally:
+        os.close(fd)
+
+    text = str(data, "utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+prefetch_batch_size = 8
+
+def prefetch_files(file_paths: List[str], submitted: Set[str]) -> None:
+    for file_path in file_paths:
+        # Once its read is queued the hint can only cost an extra open.
+        if file_path in submitted:
+            continue
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+def compile_ignore_patterns(patterns: List[str]) -> List[re.Pattern]:
+    regexes = [re.compile(pattern) for pattern in patterns]
+    # Joining into one alternation is only safe when no pattern carries global
+    # inline flags such as (?i) or groups whose numbering would shift.
+    if all(regex.groups == 0 and regex.flags == re.UNICODE for regex in regexes):
+        return [re.compile("|".join(f"(?:{pattern})" for pattern in patterns))]
+    return regexes
+
+def is_ignored(item: os.DirEntry, params: Dict) -> bool:
+    return item.name in params["ignore_names"] or any(
+        regex.match(item.path) for regex in params["ignore_regexes"]
+    )
+
 def process_directory(
     path: str,
     current_depth: int,
     params: Dict,
     output_file,
     excluded_files: List[Tuple[str, int]],
+    executor: ThreadPoolExecutor,
+    prefetcher: ThreadPoolExecutor,
 ) -> None:
     if current_depth > params["max_depth"]:
-        logging.debug(f"Max depth reached: {path}")
+        logging.debug("Max depth reached: %s", path)
         return
 
-    clear_directory_cache(path)
-    items = sorted(os.scandir(path), key=lambda e: e.name)
+    with os.scandir(path) as entries:
+        items = sorted(entries, key=lambda e: e.name)
+    if params["gitignored_paths"]:
+        kept = []
+        for item in items:
+            if item.path in params["gitignored_paths"] and not is_ignored(item, params):
+                logging.info("Skipped gitignored item: %s", item.path)
+            else:
+                kept.append(item)
+        items = kept
 
+    ignored = set()
+    traversed = set()
+    includable = {}
+    excluded = {}
     for item in items:
-        if item.name in params["ignore_patterns"] or any(
-            re.match(pattern, item.path) for pattern in params["ignore_patterns"]
+        if is_ignored(item, params):
+            ignored.add(item.path)
+        elif item.is_dir():
+            if item.name not in params["no_traverse_dirs"]:
+                traversed.add(item.path)
+        else:
+            file_size = item.stat().st_size
+            if should_include_file(item.path, file_size, params):
+                includable[item.path] = file_size
+            else:
+                excluded[item.path] = file_size
+
+    indent = params["indents"][current_depth]
+    content_indent = params["indents"][current_depth + 1]
+    window = 2 * params["max_concurrency"]
+    reads = {}
+    submitted = set()
+    next_read = 0
+    next_hint = 0
+    for index, item in enumerate(items):
+        # Keep up to `window` reads in flight ahead of the writer so they
+        # overlap, but never queue past a subdirectory that is still to be
+        # walked: contents held in memory stay bounded at any recursion depth.
+        while next_read < len(items) and len(reads) < window:
+            ahead = items[next_read]
+            if ahead.path in traversed and next_read >= index:
+                break
+            if ahead.path in includable:
+                reads[ahead.path] = executor.submit(read_text, ahead.path, includable[ahead.path])
+                submitted.add(ahead.path)
+            next_read += 1
+
+        # Once reads catch up with the last hint, ask the kernel to start
+        # pulling the next batch of files past the window into the page cache.
+        # Only one batch is ever pending so slow opens cannot build a backlog.
+        pending_hint = params["pending_hint"]
+        if (
+            next_hint <= next_read
+            and (pending_hint is None or pending_hint.done())
+            and hasattr(os, "posix_fadvise")
         ):
-            logging.info(f"Ignored item: {item.path}")
-            output_file.write(f"{'  ' * current_depth}└── {item.name}/ [Ignored]\n")
+            upcoming = []
+            next_hint = next_read
+            while next_hint < len(items) and len(upcoming) < prefetch_batch_size:
+                ahead = items[next_hint]
+                if ahead.path in traversed and next_hint >= index:
+                    break
+                if ahead.path in includable:
+                    upcoming.append(ahead.path)
+                next_hint += 1
+            if upcoming:
+                params["pending_hint"] = prefetcher.submit(prefetch_files, upcoming, submitted)
+
+        if item.path in ignored:
+            logging.info("Ignored item: %s", item.path)
+            output_file.write(f"{indent}└── {item.name}/ [Ignored]\n")
             continue
 
         if item.is_dir():
-            output_file.write(f"{'  ' * current_depth}└── {item.name}/\n")
+            output_file.write(f"{indent}└── {item.name}/\n")
             if item.name not in params["no_traverse_dirs"]:
                 process_directory(
-                    item.path, current_depth + 1, params, output_file, excluded_files
+                    item.path, current_depth + 1, params, output_file, excluded_files, executor, prefetcher
                 )
             else:
-                logging.info(f"Directory not traversed: {item.path}")
-        else:
-            if should_include_file(item.path, item.stat().st_size, params):
-                output_file.write(f"{'  ' * current_depth}├── {item.name}\n")
-                try:
-                    with open(item.path, "r", encoding="utf-8") as f:
-                        content = f.read()
-                    output_file.write(f"{'  ' * (current_depth + 1)}Content:\n")
-                    output_file.write(f"{content}\n\n")
-                except Exception as e:
-                    logging.error(f"Error processing file {item.path}: {str(e)}")
-                    output_file.write(f"{'  ' * (current_depth + 1)}[Error processing file]\n\n")
+                logging.info("Directory not traversed: %s", item.path)
+        elif item.path in includable:
+            # Emit each file record with a single write call.
+            try:
+                content = reads.pop(item.path).result()
+            except Exception as e:
+                logging.error(f"Error processing file {item.path}: {str(e)}")
+                output_file.write(f"{indent}├── {item.name}\n{content_indent}[Error processing file]\n\n")
             else:
-                output_file.write(f"{'  ' * current_depth}├── {item.name} [Excluded]\n")
-                excluded_files.append((item.path, item.stat().st_size))
+                output_file.write(f"{indent}├── {item.name}\n{content_indent}Content:\n{content}\n\n")
+        else:
+            output_file.write(f"{indent}├── {item.name} [Excluded]\n")
+            excluded_files.append((item.path, excluded[item.path]))
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
 
 def main():
     parser = argparse.ArgumentParser(description="Process a GitHub repository or local directory")
@@ -100,14 +263,20 @@ def main():
     parser.add_argument("--max-file-size", type=int, default=1024*1024, help="Maximum file size to include (in bytes)")
     parser.add_argument("--output", default="repo_structure.txt", help="Output file name")
     parser.add_argument("--log-file", default="repo_processing.log", help="Log file name")
+    parser.add_argument("--log-level", default="DEBUG", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Log file level; the console always shows INFO and above")
+    parser.add_argument("--max-concurrency", type=positive_int, default=8, help="Maximum number of files read concurrently")
+    parser.add_argument("--include-gitignored", action="store_true", help="Also process files matched by .gitignore when the path is a git repository")
     parser.add_argument("--no-traverse-dirs", nargs="+", default=default_excluded_folders, help="Directories to list but not traverse")
 
     args = parser.parse_args()
     
-    setup_logging(args.log_file)
+    setup_logging(args.log_file, args.log_level)
     logging.info("Starting repository/directory processing")
     
     params = vars(args)
+    params["indents"] = ["  " * depth for depth in range(args.max_depth + 2)]
+    params["ignore_names"] = set(args.ignore_patterns)
+    params["ignore_regexes"] = compile_ignore_patterns(args.ignore_patterns)
     
     if args.path.startswith(("http://", "https://", "git://")):
         temp_dir = "temp_repo"
@@ -116,15 +285,29 @@ def main():
     else:
         process_path = args.path
     
+    params["gitignored_paths"] = None
+    if not args.include_gitignored and os.path.exists(os.path.join(process_path, ".git")):
+        logging.info("Listing gitignored files")
+        params["gitignored_paths"] = list_gitignored_paths(process_path)
+    
     excluded_files = []
     
-    with open(args.output, "w", encoding="utf-8") as output_file:
-        logging.info("Processing repository/directory structure")
-        process_directory(process_path, 0, params, output_file, excluded_files)
+    # Readahead hints run on their own thread so they never take a read slot.
+    # They are only useful while the walk runs, so leftovers are cancelled.
+    params["pending_hint"] = None
+    prefetcher = ThreadPoolExecutor(max_workers=1)
+    try:
+        with open(args.output, "w", encoding="utf-8", buffering=1024*1024) as output_file, ThreadPoolExecutor(
+            max_workers=args.max_concurrency
+        ) as executor:
+            logging.info("Processing repository/directory structure")
+            process_directory(process_path, 0, params, output_file, excluded_files, executor, prefetcher)
+    finally:
+        prefetcher.shutdown(wait=False, cancel_futures=True)
     
     logging.info("Listing excluded files")
     for file_path, size in excluded_files:
-        logging.info(f"Excluded: {file_path} - {size} bytes")
+        logging.info("Excluded: %s - %d bytes", file_path, size)
     
     logging.info("Processing complete")
 